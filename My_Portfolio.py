@@ -1,60 +1,87 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import sqlite3
 import yfinance as yf
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
+from concurrent.futures import ThreadPoolExecutor
+
+
+@st.cache_resource
+def get_conn():
+    # One connection shared across reruns instead of open/close per call
+    conn = sqlite3.connect('portfolio.db', check_same_thread=False)
+    conn.executescript("PRAGMA journal_mode=WAL;"
+                       "PRAGMA synchronous=NORMAL;"
+                       "PRAGMA temp_store=MEMORY;"
+                       "PRAGMA cache_size=-64000;")
+    return conn
 
 
 def init_db():
-    conn = sqlite3.connect('portfolio.db')
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS stocks
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  ticker TEXT NOT NULL,
-                  shares REAL NOT NULL,
-                  cost_basis REAL NOT NULL)''')
-    conn.commit()
-    conn.close()
+    conn = get_conn()
+    with conn:
+        conn.execute('''CREATE TABLE IF NOT EXISTS stocks
+                     (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                      ticker TEXT NOT NULL,
+                      shares REAL NOT NULL,
+                      cost_basis REAL NOT NULL,
+                      account TEXT)''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_stocks_ticker ON stocks(ticker)")
 
 
 def load_portfolio():
-    conn = sqlite3.connect('portfolio.db')
-    df = pd.read_sql_query("SELECT * FROM stocks", conn)
-    conn.close()
+    conn = get_conn()
+    df = pd.read_sql_query("SELECT id, ticker, account, shares, cost_basis FROM stocks", conn,
+                           dtype={'shares': 'float64', 'cost_basis': 'float64'})
     return df
 
 
 def save_stock(ticker, account, shares, cost_basis):
-    conn = sqlite3.connect('portfolio.db')
-    c = conn.cursor()
+    conn = get_conn()
 
     # Add the 'account' column if it doesn't exist
     # c.execute("ALTER TABLE stocks ADD COLUMN account TEXT")
 
-    c.execute("INSERT INTO stocks (ticker, account, shares, cost_basis) VALUES (?, ?, ?, ?)",
-              (ticker, account, shares, cost_basis))
-    conn.commit()
-    conn.close()
+    with conn:
+        cur = conn.execute("INSERT INTO stocks (ticker, account, shares, cost_basis) VALUES (?, ?, ?, ?)",
+                           (ticker, account, shares, cost_basis))
+    return cur.lastrowid
 
 
 def update_stock(id1, account, shares, cost_basis):
-    conn = sqlite3.connect('portfolio.db')
-    c = conn.cursor()
-    if shares > 0:
-        c.execute("UPDATE stocks SET account = ?, shares = ?, cost_basis = ? WHERE id = ?",
-                  (account, shares, cost_basis, id1))
-    else:
-        c.execute("DELETE FROM stocks WHERE id = ?", (id1,))
-    conn.commit()
-    conn.close()
-
-
+    conn = get_conn()
+    with conn:
+        if shares > 0:
+            conn.execute("UPDATE stocks SET account = ?, shares = ?, cost_basis = ? WHERE id = ?",
+                         (account, shares, cost_basis, id1))
+        else:
+            conn.execute("DELETE FROM stocks WHERE id = ?", (id1,))
+
+
+def bulk_update(rows):
+    # Apply a batch of (account, shares, cost_basis, id) edits in one transaction
+    conn = get_conn()
+    updates = [row for row in rows if row[1] > 0]
+    deletes = [(row[3],) for row in rows if row[1] <= 0]
+    with conn:
+        if updates:
+            conn.executemany("UPDATE stocks SET account = ?, shares = ?, cost_basis = ? WHERE id = ?", updates)
+        if deletes:
+            conn.executemany("DELETE FROM stocks WHERE id = ?", deletes)
+
+
+@st.cache_data(ttl=900, show_spinner=False)
 def get_current_price(ticker):
     try:
         stock = yf.Ticker(ticker)
-        price = stock.info['currentPrice']
+        try:
+            # fast_info hits a lighter endpoint than the full .info blob
+            price = stock.fast_info['last_price']
+        except (KeyError, AttributeError):
+            price = stock.info.get('currentPrice')
         return price
     except IndexError:
         # Handle the case where the history data is empty
@@ -66,6 +93,78 @@ def get_current_price(ticker):
         return None
 
 
+@st.cache_data(ttl=900, show_spinner=False)
+def get_current_prices(tickers):
+    # Fetch the latest close for every ticker in one batched request
+    # (tickers is a tuple so Streamlit can hash the cache key)
+    if not tickers:
+        return pd.Series(dtype=float)
+
+    closes = yf.download(" ".join(tickers), period="5d", threads=True,
+                         progress=False, auto_adjust=False)['Close']
+    if isinstance(closes, pd.Series):
+        closes = closes.to_frame(tickers[0])
+    if closes.empty:
+        # A failed download returns a 0-row frame; let the per-ticker
+        # fallback below handle every symbol
+        prices = pd.Series(np.nan, index=list(tickers))
+    else:
+        prices = closes.ffill().iloc[-1]
+
+    # Fall back to per-ticker lookups for anything the batch missed
+    missing = [t for t in tickers if t not in prices.index or pd.isna(prices[t])]
+    if missing:
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            for ticker, price in zip(missing, executor.map(get_current_price, missing)):
+                prices[ticker] = price
+
+    return prices
+
+
+@st.cache_data(show_spinner=False)
+def build_gain_loss_fig(tickers, gain_loss, gain_loss_pct):
+    # Rebuild the two-row bar chart only when the underlying data changes
+    # (args are tuples so Streamlit can hash the cache key)
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, vertical_spacing=0.1,
+                        subplot_titles=('Total Gain/Loss by Ticker', 'Gain/Loss Percentage by Ticker'))
+
+    # Total Gain/Loss bar chart
+    fig.add_trace(
+        go.Bar(
+            x=list(tickers),
+            y=list(gain_loss),
+            name='Total Gain/Loss',
+            marker_color=np.where(np.asarray(gain_loss) < 0, 'red', 'green')
+        ),
+        row=1, col=1
+    )
+
+    # Gain/Loss Percentage bar chart
+    fig.add_trace(
+        go.Bar(
+            x=list(tickers),
+            y=list(gain_loss_pct),
+            name='Gain/Loss %',
+            marker_color=np.where(np.asarray(gain_loss_pct) < 0, 'red', 'green')
+        ),
+        row=2, col=1
+    )
+
+    fig.update_layout(height=1200,
+                      title_text="Portfolio Performance by Ticker",
+                      titlefont_size=26,
+                      title_font_color="white",
+                      showlegend=False,
+                      xaxis_showticklabels=True
+                      )
+    # fig.update_xaxes(title_text="Ticker", row=1, col=1)
+    # fig.update_xaxes(title_text="Ticker", row=2, col=1)
+    fig.update_yaxes(title_text="Total Gain/Loss ($)", row=1, col=1)
+    fig.update_yaxes(title_text="Gain/Loss %", row=2, col=1)
+
+    return fig
+
+
 def main():
     st.set_page_config(layout="wide", page_title="Portfolio Tracker", page_icon=":material/trending_up:")
 
@@ -79,44 +178,41 @@ def main():
 
     account_options = ['Webull', 'Fidelity', 'HSA']
 
-    # Create a new DataFrame for display
-    display_df = st.session_state.portfolio.copy()
-    display_df['Current Price'] = display_df['ticker'].apply(get_current_price)
-    display_df['Total Value'] = display_df['shares'] * display_df['Current Price']
-    total_portfolio_value = display_df['Total Value'].sum()
-    display_df['Portfolio %'] = (display_df['Total Value'] / total_portfolio_value) * 100
-    display_df['Gain/Loss'] = display_df['Total Value'] - (display_df['cost_basis'] * display_df['shares'])
-    display_df['Gain/Loss %'] = (display_df['Gain/Loss'] / (display_df['cost_basis'] * display_df['shares'])) * 100
-
-    # Sort the DataFrame by Total Value, from highest to lowest
-    display_df = display_df.sort_values('Total Value', ascending=False)
-
-    # Format the DataFrame for display
-    display_df['Shares'] = display_df['shares'].apply(lambda x: f"{x:.2f}")
-    display_df['Cost Basis'] = display_df['cost_basis'].apply(lambda x: f"${x:.2f}")
-    display_df['Current Price'] = display_df['Current Price'].apply(lambda x: f"${x:.2f}" if x else "N/A")
-    display_df['Total Value'] = display_df['Total Value'].apply(lambda x: f"${x:.2f}")
-    display_df['Portfolio %'] = display_df['Portfolio %'].apply(lambda x: f"{x:.2f}%")
-    display_df['Gain/Loss'] = display_df['Gain/Loss'].apply(lambda x: f"${x:.2f}")
-    display_df['Gain/Loss %'] = display_df['Gain/Loss %'].apply(lambda x: f"{x:.2f}%")
-
-    # Reorder and rename columns
-    display_df = display_df[['ticker', 'account', 'Shares', 'Cost Basis', 'Current Price', 'Total Value', 'Portfolio %',
-                             'Gain/Loss', 'Gain/Loss %']]
-    display_df.columns = ['Ticker', 'Account', 'Shares', 'Cost Basis', 'Current Price', 'Total Value', 'Portfolio %',
-                          'Gain/Loss', 'Gain/Loss %']
+    # Pull the raw columns into NumPy arrays
+    portfolio = st.session_state.portfolio
+    current_prices = get_current_prices(tuple(portfolio['ticker']))
+    prices = portfolio['ticker'].map(current_prices).astype(float).to_numpy()
+    shares = portfolio['shares'].to_numpy(float)
+    cost_basis = portfolio['cost_basis'].to_numpy(float)
+
+    # Derive every display column in one pass, sorted by Total Value
+    total_values = shares * prices
+    basis = shares * cost_basis
+    gain_loss = total_values - basis
+    # nansum keeps the totals real when a price lookup failed for one row
+    total_value = np.nansum(total_values)
+    total_cost = np.nansum(basis)
+    # Sort NaN-valued holdings (failed price lookups) to the bottom
+    order = np.argsort(np.nan_to_num(total_values, nan=-np.inf))[::-1]
+
+    display_df = pd.DataFrame({
+        'Ticker': portfolio['ticker'].to_numpy()[order],
+        'Account': portfolio['account'].to_numpy()[order],
+        'Shares': shares[order],
+        'Cost Basis': cost_basis[order],
+        'Current Price': prices[order],
+        'Total Value': total_values[order],
+        'Portfolio %': (total_values / total_value * 100)[order],
+        'Gain/Loss': gain_loss[order],
+        'Gain/Loss %': (gain_loss / basis * 100)[order],
+    })
 
     # Display total portfolio value and total gain/loss
-    total_value = display_df['Total Value'].apply(lambda x: float(x.replace('$', ''))).sum()
-    total_cost = (st.session_state.portfolio['cost_basis'] * st.session_state.portfolio['shares']).sum()
     total_gain_loss = total_value - total_cost
     total_gain_loss_percent = (total_gain_loss / total_cost) * 100 if total_cost > 0 else 0
 
-    # Create a DataFrame for charts
-    chart_df = display_df.copy()
-    chart_df['Total Value'] = chart_df['Total Value'].apply(lambda x: float(x.replace('$', '').replace(',', '')))
-    chart_df['Gain/Loss'] = chart_df['Gain/Loss'].apply(lambda x: float(x.replace('$', '').replace(',', '')))
-    chart_df['Gain/Loss %'] = chart_df['Gain/Loss %'].apply(lambda x: float(x.replace('%', '')))
+    # Charts read the numeric columns directly
+    chart_df = display_df
 
     # Portfolio Summary section
     st.subheader(":blue[Portfolio Summary]")
@@ -147,10 +243,12 @@ def main():
 
     st.subheader(":blue[My Stocks]")
 
-    # Set index start to 1 and display "My Stocks"" table
+    # Set index start to 1 and display "My Stocks"" table, formatting only for display
     display_df.index = range(1, len(display_df)+1)
-    # sorted_df = display_df.sort_values(by='Total Value', ascending=False)
-    st.table(display_df)
+    st.dataframe(display_df.style.format({'Shares': '{:.2f}', 'Cost Basis': '${:.2f}', 'Current Price': '${:.2f}',
+                                          'Total Value': '${:.2f}', 'Portfolio %': '{:.2f}%', 'Gain/Loss': '${:.2f}',
+                                          'Gain/Loss %': '{:.2f}%'}, na_rep='N/A'),
+                 use_container_width=True)
 
     # Collapsible section for adding new stock
     with st.expander("Add New Stock"):
@@ -162,76 +260,46 @@ def main():
 
             submitted = st.form_submit_button("Add Stock")
             if submitted:
-                print(account)
-                save_stock(ticker, account, shares, cost_basis)
-                st.session_state.portfolio = load_portfolio()
+                new_id = save_stock(ticker, account, shares, cost_basis)
+                # Append the new holding in memory instead of re-reading the table
+                new_row = pd.DataFrame([{'id': new_id, 'ticker': ticker, 'shares': shares,
+                                         'cost_basis': cost_basis, 'account': account}])
+                st.session_state.portfolio = pd.concat([st.session_state.portfolio, new_row],
+                                                       ignore_index=True)
                 st.success(f"Added {ticker} to your {account} portfolio!")
 
     # Edit my stocks functionality in an expander
     with st.expander("Edit Portfolio"):
         st.subheader("Edit Your Holdings")
-        for index, row in st.session_state.portfolio.iterrows():
-            col1, col2, col3, col4, col5 = st.columns([2, 2, 2, 2, 1])
-            with col1:
-                st.write(row['ticker'])
-            with col2:
-                account = st.selectbox(f"Account for {row['ticker']}", account_options,
-                                       index=account_options.index(row['account']), key=f"account_{row['id']}")
-            with col3:
-                shares = st.number_input(f"Shares {row['ticker']}", value=row['shares'], key=f"shares_{row['id']}")
-            with col4:
-                cost_basis = st.number_input(f"Cost Basis {row['ticker']}", value=row['cost_basis'],
-                                             key=f"cost_{row['id']}")
-            with col5:
-                if st.button("Update", key=f"update_{row['id']}"):
-                    update_stock(row['id'], account, shares, cost_basis)
-                    st.session_state.portfolio = load_portfolio()
-                    if shares > 0:
-                        st.success(f"Updated {row['ticker']} in your portfolio!")
-                    else:
-                        st.success(f"Removed {row['ticker']} from your portfolio!")
-                    st.success(f"Updated {row['ticker']} in your portfolio!")
-                    st.rerun()
+        st.caption("Set shares to 0 to remove a stock.")
+        edited = st.data_editor(
+            st.session_state.portfolio,
+            column_config={
+                'id': st.column_config.NumberColumn("ID", disabled=True),
+                'ticker': st.column_config.TextColumn("Ticker", disabled=True),
+                'account': st.column_config.SelectboxColumn("Account", options=account_options),
+                'shares': st.column_config.NumberColumn("Shares", min_value=0.0, step=0.01),
+                'cost_basis': st.column_config.NumberColumn("Cost Basis", min_value=0.0, step=0.01),
+            },
+            hide_index=True,
+            key='portfolio_editor',
+        )
+        if st.button("Save Changes"):
+            # Only write back the rows that actually changed, in one transaction
+            changed = edited[(edited != st.session_state.portfolio).any(axis=1)]
+            if len(changed) > 0:
+                bulk_update(list(zip(changed['account'], changed['shares'], changed['cost_basis'], changed['id'])))
+                # The edited frame already reflects the new state; keep it in
+                # memory instead of re-reading the table
+                st.session_state.portfolio = edited[edited['shares'] > 0].reset_index(drop=True)
+                st.success("Portfolio updated!")
+                st.rerun()
 
     st.divider()
 
     # Bar charts showing total Gain and Gain Percentage by Ticker
-    fig1 = make_subplots(rows=2, cols=1, shared_xaxes=True, vertical_spacing=0.1,
-                         subplot_titles=('Total Gain/Loss by Ticker', 'Gain/Loss Percentage by Ticker'))
-
-    # Total Gain/Loss bar chart
-    fig1.add_trace(
-        go.Bar(
-            x=chart_df['Ticker'],
-            y=chart_df['Gain/Loss'],
-            name='Total Gain/Loss',
-            marker_color=['red' if x < 0 else 'green' for x in chart_df['Gain/Loss']]
-        ),
-        row=1, col=1
-    )
-
-    # Gain/Loss Percentage bar chart
-    fig1.add_trace(
-        go.Bar(
-            x=chart_df['Ticker'],
-            y=chart_df['Gain/Loss %'],
-            name='Gain/Loss %',
-            marker_color=['red' if x < 0 else 'green' for x in chart_df['Gain/Loss %']]
-        ),
-        row=2, col=1
-    )
-
-    fig1.update_layout(height=1200,
-                       title_text="Portfolio Performance by Ticker",
-                       titlefont_size=26,
-                       title_font_color="white",
-                       showlegend=False,
-                       xaxis_showticklabels=True
-                       )
-    # fig1.update_xaxes(title_text="Ticker", row=1, col=1)
-    # fig1.update_xaxes(title_text="Ticker", row=2, col=1)
-    fig1.update_yaxes(title_text="Total Gain/Loss ($)", row=1, col=1)
-    fig1.update_yaxes(title_text="Gain/Loss %", row=2, col=1)
+    fig1 = build_gain_loss_fig(tuple(chart_df['Ticker']), tuple(chart_df['Gain/Loss']),
+                               tuple(chart_df['Gain/Loss %']))
 
     st.plotly_chart(fig1)
 
@@ -1,20 +1,59 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import sqlite3
 import yfinance as yf
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from datetime import datetime
-
-
-def load_portfolio():
-    conn = sqlite3.connect('portfolio.db')
-    df = pd.read_sql_query("SELECT * FROM stocks", conn)
-    conn.close()
-    return df
-
-
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+# Recheck non-paying tickers this often
+DIVIDEND_CHECK_TTL = timedelta(days=7)
+
+
+@st.cache_resource
+def get_conn():
+    # One connection shared across reruns instead of open/close per call
+    conn = sqlite3.connect('portfolio.db', check_same_thread=False)
+    conn.executescript("PRAGMA journal_mode=WAL;"
+                       "PRAGMA synchronous=NORMAL;"
+                       "PRAGMA temp_store=MEMORY;"
+                       "PRAGMA cache_size=-64000;")
+    return conn
+
+
+def init_dividend_status():
+    conn = get_conn()
+    with conn:
+        conn.execute('''CREATE TABLE IF NOT EXISTS dividend_status
+                     (ticker TEXT PRIMARY KEY,
+                      pays_dividend INTEGER NOT NULL,
+                      checked_at TEXT NOT NULL)''')
+
+
+def load_dividend_candidates():
+    # Filter out tickers recently confirmed as non-payers in SQL, so no
+    # network call is spent on them at all
+    conn = get_conn()
+    cutoff = (datetime.now() - DIVIDEND_CHECK_TTL).isoformat()
+    query = ("SELECT id, ticker, account, shares, cost_basis FROM stocks WHERE ticker NOT IN "
+             "(SELECT ticker FROM dividend_status WHERE pays_dividend = 0 AND checked_at >= ?)")
+    return pd.read_sql_query(query, conn, params=(cutoff,),
+                             dtype={'shares': 'float64', 'cost_basis': 'float64'})
+
+
+def record_dividend_status(statuses):
+    conn = get_conn()
+    checked_at = datetime.now().isoformat()
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO dividend_status (ticker, pays_dividend, checked_at) "
+                         "VALUES (?, ?, ?)",
+                         [(ticker, int(pays), checked_at) for ticker, pays in statuses])
+
+
+@st.cache_data(ttl=900, show_spinner=False)
 def get_dividend_info(ticker, shares):
     stock = yf.Ticker(ticker)
     info = stock.info
@@ -36,20 +75,57 @@ def get_dividend_info(ticker, shares):
     return None
 
 
+@st.cache_data(show_spinner=False)
+def build_dividend_fig(tickers, totals, yields, payouts):
+    # Rebuild the three-row bar chart only when the underlying data changes
+    # (args are tuples so Streamlit can hash the cache key)
+    fig = make_subplots(rows=3, cols=1, subplot_titles=("Yearly Dividend Totals", "Dividend Yield", "Payout Ratio"))
+
+    # Dividend totals vs. ticker
+    fig.add_trace(
+        go.Bar(x=list(tickers), y=list(totals), name="Yearly Dividend Total", marker_color='darkblue'),
+        row=1, col=1
+    )
+
+    # Dividend yield vs. ticker
+    fig.add_trace(
+        go.Bar(x=list(tickers), y=list(yields), name="Dividend Yield", marker_color='blueviolet'),
+        row=2, col=1
+    )
+
+    # Payout ratio vs. ticker (color-coded)
+    p = np.asarray(payouts)
+    colors = np.select([p < 50, p < 70], ['green', 'yellow'], default='red')
+    fig.add_trace(
+        go.Bar(x=list(tickers), y=list(payouts), name="Payout Ratio", marker_color=colors),
+        row=3, col=1
+    )
+
+    fig.update_layout(height=1200, title_text="Dividend Analysis", titlefont_size=26,)
+    fig.update_xaxes(title_text="Ticker", row=3, col=1)
+    fig.update_yaxes(title_text="Yearly Dividend Total ($)", row=1, col=1)
+    fig.update_yaxes(title_text="Dividend Yield (%)", row=2, col=1)
+    fig.update_yaxes(title_text="Payout Ratio (%)", row=3, col=1)
+
+    return fig
+
+
 def main():
     st.set_page_config(layout="wide", page_title="Dividends", page_icon=":material/attach_money:")
     st.header(":rainbow[Dividend Tracker]", divider='rainbow')
     st.write("")
 
-    # Load portfolio data
-    portfolio = load_portfolio()
+    # Load portfolio data, skipping tickers recently confirmed as non-payers
+    init_dividend_status()
+    portfolio = load_dividend_candidates()
 
-    # Get dividend information for each stock
+    # Get dividend information for all stocks in parallel
     dividend_data = []
-    for _, row in portfolio.iterrows():
-        div_info = get_dividend_info(row['ticker'], row['shares'])
-        if div_info:
-            dividend_data.append(div_info)
+    if len(portfolio) > 0:
+        with ThreadPoolExecutor(max_workers=min(16, len(portfolio))) as executor:
+            results = list(executor.map(get_dividend_info, portfolio['ticker'], portfolio['shares']))
+        dividend_data = [div_info for div_info in results if div_info]
+        record_dividend_status(zip(portfolio['ticker'], [div_info is not None for div_info in results]))
 
     # Create DataFrame from dividend data
     if dividend_data:
@@ -105,32 +181,8 @@ def main():
         df['Payout'] = df['Payout'].apply(lambda x: float(x.replace('%', '')))
 
         # Generate charts
-        fig = make_subplots(rows=3, cols=1, subplot_titles=("Yearly Dividend Totals", "Dividend Yield", "Payout Ratio"))
-
-        # Dividend totals vs. ticker
-        fig.add_trace(
-            go.Bar(x=df['Ticker'], y=df['Total'], name="Yearly Dividend Total", marker_color='darkblue'),
-            row=1, col=1
-        )
-
-        # Dividend yield vs. ticker
-        fig.add_trace(
-            go.Bar(x=df['Ticker'], y=df['Yield'], name="Dividend Yield", marker_color='blueviolet'),
-            row=2, col=1
-        )
-
-        # Payout ratio vs. ticker (color-coded)
-        colors = ['green' if x < 50 else 'yellow' if 50 <= x < 70 else 'red' for x in df['Payout']]
-        fig.add_trace(
-            go.Bar(x=df['Ticker'], y=df['Payout'], name="Payout Ratio", marker_color=colors),
-            row=3, col=1
-        )
-
-        fig.update_layout(height=1200, title_text="Dividend Analysis", titlefont_size=26,)
-        fig.update_xaxes(title_text="Ticker", row=3, col=1)
-        fig.update_yaxes(title_text="Yearly Dividend Total ($)", row=1, col=1)
-        fig.update_yaxes(title_text="Dividend Yield (%)", row=2, col=1)
-        fig.update_yaxes(title_text="Payout Ratio (%)", row=3, col=1)
+        fig = build_dividend_fig(tuple(df['Ticker']), tuple(df['Total']), tuple(df['Yield']),
+                                 tuple(df['Payout']))
 
         st.plotly_chart(fig)
     else:
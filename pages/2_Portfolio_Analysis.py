@@ -7,17 +7,33 @@ from datetime import datetime, timedelta
 import plotly.express as px
 
 
+@st.cache_resource
+def get_conn():
+    # One connection shared across reruns instead of open/close per call
+    conn = sqlite3.connect('portfolio.db', check_same_thread=False)
+    conn.executescript("PRAGMA journal_mode=WAL;"
+                       "PRAGMA synchronous=NORMAL;"
+                       "PRAGMA temp_store=MEMORY;"
+                       "PRAGMA cache_size=-64000;")
+    return conn
+
+
 def load_portfolio():
-    conn = sqlite3.connect('portfolio.db')
-    df = pd.read_sql_query("SELECT * FROM stocks", conn)
-    conn.close()
+    conn = get_conn()
+    df = pd.read_sql_query("SELECT id, ticker, account, shares, cost_basis FROM stocks", conn,
+                           dtype={'shares': 'float64', 'cost_basis': 'float64'})
     return df
 
 
+@st.cache_data(ttl=900, show_spinner=False)
 def get_current_price(ticker):
     try:
         stock = yf.Ticker(ticker)
-        price = stock.info['currentPrice']
+        try:
+            # fast_info hits a lighter endpoint than the full .info blob
+            price = stock.fast_info['last_price']
+        except (KeyError, AttributeError):
+            price = stock.info.get('currentPrice')
         return price
     except IndexError:
         # Handle the case where the history data is empty
@@ -29,6 +45,42 @@ def get_current_price(ticker):
         return None
 
 
+@st.cache_data(ttl=3600, show_spinner=False)
+def load_history(tickers, start, end):
+    # Fetch 5 years of closes for every ticker in one batched request
+    # (tickers is a sorted tuple so the cache key is stable across reruns)
+    panel = yf.download(" ".join(tickers), start=start, end=end,
+                        threads=True, progress=False, auto_adjust=False)['Close']
+    if isinstance(panel, pd.Series):
+        panel = panel.to_frame(tickers[0])
+
+    # The download already gives a wide float64 frame; fill the gaps in
+    # place rather than allocating intermediate copies
+    if panel.index.tz is not None:
+        panel.index = panel.index.tz_localize(None)
+    panel.ffill(inplace=True)
+    panel.bfill(inplace=True)
+
+    # A failed download returns a 0-row frame; raise instead of returning
+    # it so the empty panel is never cached for the TTL
+    if panel.empty:
+        raise RuntimeError(f"No price history returned for: {', '.join(tickers)}")
+    return panel
+
+
+@st.cache_data(show_spinner=False)
+def returns_stats(prices):
+    # One fused pass over the price matrix: daily log-returns, their means,
+    # per-stock std and the covariance matrix (via a single BLAS matmul);
+    # cached so reruns on an unchanged panel skip the recompute
+    returns = np.diff(np.log(prices), axis=0)
+    mu = returns.mean(axis=0)
+    centered = returns - mu
+    cov = centered.T @ centered / (returns.shape[0] - 1)
+    std = np.sqrt(np.diag(cov))
+    return returns, mu, std, cov
+
+
 def main():
     st.set_page_config(layout="wide", page_title="Risk Analysis", page_icon=":material/analytics:")
     st.header(":rainbow[Portfolio Analysis]", divider='rainbow')
@@ -37,59 +89,65 @@ def main():
     if 'portfolio' not in st.session_state:
         st.session_state.portfolio = load_portfolio()
 
-    # Get weights list for individual stocks (Portfolio %)
     risk_df = st.session_state.portfolio.copy()
-    risk_df['Current Price'] = risk_df['ticker'].apply(get_current_price)
-    risk_df['Total Value'] = risk_df['shares'] * risk_df['Current Price']
-    total_portfolio_value = risk_df['Total Value'].sum()
-    risk_df['Portfolio %'] = (risk_df['Total Value'] / total_portfolio_value) * 100
-    weights_list = risk_df['Portfolio %'].tolist()
 
     # Create list of stocks (tickers)
     stock_list = risk_df['ticker'].tolist()
 
-    # Get historical stock price data for the last 5 years
-    end_date = datetime.now().strftime('%Y-%m-%d')
-    start_date = (datetime.now() - timedelta(days=365 * 5)).strftime('%Y-%m-%d')
+    # Get historical stock price data for the last 5 years in one batched
+    # request; the date window is computed once per day so the history
+    # cache key stays stable across reruns
+    today = datetime.now().date()
+    end_date = today.isoformat()
+    start_date = (today - timedelta(days=365 * 5)).isoformat()
 
-    data = {}
+    try:
+        panel = load_history(tuple(sorted(stock_list)), start_date, end_date)
+    except RuntimeError:
+        st.warning("Could not download price history from Yahoo Finance. Please try again later.")
+        st.stop()
+
+    df_prices = panel.reindex(columns=stock_list)
+
+    # Get weights list for individual stocks (Portfolio %) from the latest close
+    current_prices = df_prices.ffill().iloc[-1]
 
-    for stock in stock_list:
-        ticker = yf.Ticker(stock)
-        history = ticker.history(start=start_date, end=end_date)
-        data[stock] = history['Close']
+    # Fall back to per-ticker lookups for anything missing from the panel
+    for ticker in current_prices[current_prices.isna()].index:
+        current_prices[ticker] = get_current_price(ticker)
 
-    df_prices = pd.DataFrame(data)
-    df_prices.index = df_prices.index.tz_localize(None)
-    df_prices.bfill(inplace=True)
+    risk_df['Current Price'] = risk_df['ticker'].map(current_prices).astype(float)
+    risk_df['Total Value'] = risk_df['shares'] * risk_df['Current Price']
+    total_portfolio_value = risk_df['Total Value'].sum()
+    risk_df['Portfolio %'] = (risk_df['Total Value'] / total_portfolio_value) * 100
 
-    # Calculate percent change and covariance matrix from price history
-    returns_df = df_prices.pct_change(1)
-    vcv_matrix = returns_df.cov()
+    # Daily returns, means, per-stock std and covariance from price history
+    returns, mu, std, cov = returns_stats(df_prices.to_numpy(np.float64))
 
-    # Calculate variance and standard deviation
-    var_p = np.dot(np.transpose(weights_list), np.dot(vcv_matrix, weights_list))
+    # Calculate variance and standard deviation with fractional weights,
+    # aligned to the price panel's column order
+    weights = risk_df.set_index('ticker').loc[df_prices.columns, 'Portfolio %'].to_numpy() / 100.0
+    var_p = weights @ cov @ weights
     sd_p = np.sqrt(var_p)
 
     # Get annual portfolio and individual stock risks
     sd_p_annual = sd_p * np.sqrt(250)
-    individual_risks = np.std(returns_df, axis=0, ddof=1) * np.sqrt(250)
+    individual_risks = pd.Series(std, index=df_prices.columns) * np.sqrt(250)
 
     # Calculate individual sharp ratio
-    sharp_individual = (returns_df.mean() / returns_df.std()) * np.sqrt(250)
+    sharp_individual = pd.Series(mu / std, index=df_prices.columns) * np.sqrt(250)
 
     # Get values to calculate portfolio Sharpe Ratio
     shares_df = risk_df.filter(["ticker", "shares"])
     shares_df.set_index("ticker", inplace=True)
-    prices_df = df_prices.copy()
 
-    # Multiply prices by shares to get total value
-    for ticker in shares_df.index:
-        if ticker in prices_df.columns:
-            prices_df[ticker] = prices_df[ticker] * shares_df.loc[ticker, "shares"]
+    # Multiply prices by shares in one broadcast to get total value per day
+    shares_vec = shares_df['shares'].reindex(df_prices.columns).to_numpy()
+    values = df_prices.to_numpy() * shares_vec
+    prices_df = pd.DataFrame(values, index=df_prices.index, columns=df_prices.columns)
 
     # Add a new column that sums each row
-    prices_df['Total Value'] = prices_df.iloc[:, 1:].sum(axis=1)
+    prices_df['Total Value'] = values.sum(axis=1)
 
     # Add new column for daily return
     prices_df["return"] = prices_df['Total Value'].pct_change().fillna(0) * 100
@@ -104,7 +162,7 @@ def main():
     col1, col2, col3 = st.columns([1, 1, 1])
     with col1:
         st.subheader("Annual Portfolio Risk")
-        st.subheader(f":blue[{sd_p_annual / 100:.3f}]")
+        st.subheader(f":blue[{sd_p_annual:.3f}]")
     with col2:
         st.subheader("Portfolio Sharpe Ratio")
         st.subheader(f":blue[{sharpe_ratio}]")